@@ -0,0 +1,84 @@
+import ollama
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Only forwarded when set; otherwise the server's own keep-alive applies
+KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE')
+
+# Room for a typical PR diff after the prompt. KV-cache memory grows
+# linearly with it: for a 7B model at f16, 8192 needs about 4 GB more than
+# Ollama's 2048 default, so lower REVIEW_NUM_CTX on small runners.
+NUM_CTX = int(os.environ.get('REVIEW_NUM_CTX', '8192'))
+
+_CLIENT = None
+
+
+def _client():
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = ollama.Client(
+            host=os.environ.get('OLLAMA_HOST', 'http://127.0.0.1:11434'))
+    return _CLIENT
+
+
+def _read_cache(path):
+    try:
+        cached = json.loads(path.read_text())
+    except (OSError, ValueError):
+        # Missing or damaged entry (e.g. a job killed mid-write): a miss
+        return None
+    if not isinstance(cached, dict) or not isinstance(cached.get('response'), str):
+        return None
+    return cached
+
+
+def _write_cache(path, result):
+    # Temp files live in a sibling directory, so one orphaned by a killed
+    # job never ends up in the cache dir that CI saves and restores
+    tmp_dir = path.parent.with_name(f".{path.parent.name}-tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        # A read-only cache dir shouldn't fail the review
+        pass
+
+
+def cached_generate(model, prompt, options, keep_alive=KEEP_ALIVE,
+                    is_complete=None):
+    key = hashlib.sha256(
+        f"{model}\0{json.dumps(options, sort_keys=True)}\0{prompt}"
+        .encode()).hexdigest()
+    path = Path(os.environ.get('REVIEW_CACHE', '~/.cache/review_pr')
+                ).expanduser() / f"{key}.json"
+    cached = _read_cache(path)
+    if cached is not None:
+        return cached
+
+    # Stream the reply so callers can stop as soon as is_complete says the
+    # answer has arrived, instead of waiting for whatever follows it.
+    response = ''
+    done_reason = None
+    for chunk in _client().generate(
+            model=model, prompt=prompt, stream=True,
+            options=options, keep_alive=keep_alive):
+        response += chunk['response']
+        done_reason = chunk.get('done_reason')
+        if is_complete is not None and is_complete(response):
+            break
+    result = {"response": response, "done_reason": done_reason}
+    # A reply cut off by num_predict is incomplete; don't make it permanent
+    if done_reason != 'length':
+        _write_cache(path, result)
+    return result
@@ -1,8 +1,25 @@
-import ollama
 import git
 import os
 import sys
 import time
+from ollama_cache import NUM_CTX, cached_generate
+
+# Static reviewer instructions; keep them first and unchanged so the prompt
+# prefix stays cacheable on the Ollama side.
+SYSTEM_PROMPT = """You are an expert code reviewer. Review the following code changes (diff) for:
+- Bugs or errors
+- Code style and best practices
+- Performance improvements
+- Security issues
+- Suggestions for better code
+
+Provide comments in a numbered list, with line references if possible. Be constructive and specific.
+
+"""
+
+# No num_predict here: the free-form review has no structure to recover
+# if it is cut off, so let it run to completion.
+GENERATE_OPTIONS = {"num_ctx": NUM_CTX, "temperature": 0}
 
 
 def get_pr_diff(repo_path='.'):
@@ -10,7 +27,7 @@ def get_pr_diff(repo_path='.'):
         repo = git.Repo(repo_path)
         current_branch = repo.active_branch.name
         # Adjust 'main' if your base branch is different
-        diff = repo.git.diff('main', current_branch)
+        diff = repo.git.diff('main', current_branch, unified=2)
         return diff
     except Exception as e:
         return f"Error getting diff: {str(e)}"
@@ -19,24 +36,10 @@ def get_pr_diff(repo_path='.'):
 def review_code(diff):
     if not diff:
         return "No changes to review."
-    prompt = f"""
-    You are an expert code reviewer. Review the following code changes (diff) for:
-    - Bugs or errors
-    - Code style and best practices
-    - Performance improvements
-    - Security issues
-    - Suggestions for better code
-
-    Provide comments in a numbered list, with line references if possible. Be constructive and specific.
-
-    Diff:
-    {diff}
-    """
+    prompt = f"{SYSTEM_PROMPT}Diff:\n{diff}\n"
     try:
-        # Matches your Ollama host
-        client = ollama.Client(host='http://127.0.0.1:11434')
-        response = client.generate(
-            model='codellama:7b-instruct', prompt=prompt)
+        response = cached_generate(
+            'codellama:7b-instruct', prompt, GENERATE_OPTIONS)
         return response['response']
     except Exception as e:
         return f"Error connecting to Ollama: {str(e)}"
@@ -1,16 +1,106 @@
-import ollama
 import git
 import os
 import sys
 import re
 import json
+from ollama_cache import NUM_CTX, cached_generate
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+_decoder = json.JSONDecoder()
+_ARRAY_START = re.compile(r'^\[', re.M)
+_ITEM_SEP = re.compile(r'[\s,]*')
+REVIEW_KEYS = {'file', 'line', 'comment'}
+
+# Kept byte-identical at the head of every prompt so Ollama can reuse the
+# cached prefill for it across requests.
+SYSTEM_PROMPT = """You are an expert React and JavaScript code reviewer. Review the following code changes (diff) for:
+- Bugs
+- React best practices
+- Code style
+- Performance
+- Security
+Return output as JSON array of objects with:
+- file: file path (guess from diff header if possible, otherwise 'UNKNOWN')
+- line: line number in new code
+- comment: the review comment
+"""
+
+GENERATE_OPTIONS = {"num_ctx": NUM_CTX, "temperature": 0, "num_predict": 1024}
+
+
+def _json_array(text):
+    try:
+        parsed = _loads(text)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, list):
+        return parsed
+
+    # Otherwise look for an array opening at column 0 (a ```json fence
+    # line included), which skips '[' inside prose and indented arrays
+    # nested in the items. An empty array is only used if nothing better
+    # follows it.
+    empty = None
+    for match in _ARRAY_START.finditer(text):
+        try:
+            parsed, _ = _decoder.raw_decode(text, match.end() - 1)
+        except ValueError:
+            continue
+        if not isinstance(parsed, list):
+            continue
+        if not parsed:
+            empty = parsed if empty is None else empty
+        elif all(isinstance(i, dict) for i in parsed):
+            return parsed
+    return empty
+
+
+# Stricter than _json_array: the array must be non-empty and every item
+# must carry file/line/comment before a streamed reply counts as complete.
+def _review_items(text):
+    items = _json_array(text)
+    if not items:
+        return None
+    for item in items:
+        if not isinstance(item, dict) or not REVIEW_KEYS <= item.keys():
+            return None
+    return items
+
+
+# Recover the items that were closed before num_predict cut the array off
+def _truncated_items(text):
+    for match in _ARRAY_START.finditer(text):
+        items = []
+        pos = match.end()
+        while True:
+            pos = _ITEM_SEP.match(text, pos).end()
+            try:
+                item, pos = _decoder.raw_decode(text, pos)
+            except ValueError:
+                break
+            if not isinstance(item, dict) or not REVIEW_KEYS <= item.keys():
+                break
+            items.append(item)
+        if items:
+            return items
+    return None
+
+
+# Used to stop streaming once the whole array has been generated
+def _is_complete_review(text):
+    return text.rstrip().endswith(']') and _review_items(text) is not None
 
 
 def get_pr_diff(repo_path='.'):
     try:
         repo = git.Repo(repo_path)
         current_branch = repo.active_branch.name
-        diff = repo.git.diff('main', current_branch)
+        diff = repo.git.diff('main', current_branch, unified=2)
         return diff
     except Exception as e:
         return f"Error getting diff: {str(e)}"
@@ -20,34 +110,22 @@ def review_code(diff):
     if not diff:
         return []
 
-    prompt = f"""
-    You are an expert React and JavaScript code reviewer. Review the following code changes (diff) for:
-    - Bugs
-    - React best practices
-    - Code style
-    - Performance
-    - Security
-    Return output as JSON array of objects with:
-    - file: file path (guess from diff header if possible, otherwise 'UNKNOWN')
-    - line: line number in new code
-    - comment: the review comment
-    Diff:
-    {diff}
-    """
+    prompt = f"{SYSTEM_PROMPT}Diff:\n{diff}\n"
 
     try:
-        client = ollama.Client(host='http://127.0.0.1:11434')
-        response = client.generate(
-            model='codellama:7b-instruct', prompt=prompt)
+        response = cached_generate(
+            'codellama:7b-instruct', prompt, GENERATE_OPTIONS,
+            is_complete=_is_complete_review)
         review = response['response']
 
-        # Assume model returns JSON or text we can eval/parse
-        try:
-            parsed = json.loads(review)
+        # Model may surround the JSON array with prose or a code fence
+        parsed = _json_array(review)
+        if not parsed and response.get('done_reason') == 'length':
+            parsed = _truncated_items(review)
+        if parsed is not None:
             return parsed
-        except Exception:
-            # fallback: wrap in one object
-            return [{"file": "UNKNOWN", "line": 1, "comment": review}]
+        # fallback: wrap in one object
+        return [{"file": "UNKNOWN", "line": 1, "comment": review}]
     except Exception as e:
         return [{"file": "UNKNOWN", "line": 1, "comment": f"Error: {str(e)}"}]
 
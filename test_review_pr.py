@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import ollama_cache
+import review_pr
+
+
+class FakeClient:
+    def __init__(self, chunks, done_reason='stop'):
+        self.chunks = chunks
+        self.done_reason = done_reason
+        self.sent = []
+
+    def generate(self, **kwargs):
+        for i, text in enumerate(self.chunks):
+            self.sent.append(text)
+            last = i == len(self.chunks) - 1
+            yield {"response": text, "done": last,
+                   "done_reason": self.done_reason if last else None}
+
+
+class ReviewCodeTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = os.path.join(tmp.name, 'cache')
+        patcher = mock.patch.dict(os.environ, {'REVIEW_CACHE': self.cache_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def review(self, chunks, done_reason='stop'):
+        client = FakeClient(chunks, done_reason)
+        with mock.patch.object(ollama_cache, '_CLIENT', client):
+            return review_pr.review_code('diff'), client
+
+    def test_nested_indented_array_does_not_stop_stream(self):
+        items, client = self.review([
+            '[\n  {"file": "a.js", "line": 1, "comment": "x", "ex": [\n'
+            '    {"a": 1}\n  ]',
+            '},\n  {"file": "b.js", "line": 2, "comment": "y"}\n]',
+            '\nTAIL',
+        ])
+        self.assertEqual([i['file'] for i in items], ['a.js', 'b.js'])
+        self.assertNotIn('\nTAIL', client.sent)
+
+    def test_empty_format_example_is_skipped(self):
+        items, _ = self.review([
+            'Here is the format:\n[]',
+            '\nReview:\n[{"file": "a.js", "line": 1, "comment": "x"}]',
+        ])
+        self.assertEqual(items, [{"file": "a.js", "line": 1, "comment": "x"}])
+
+    def test_fenced_reply(self):
+        items, client = self.review([
+            '```json\n[{"file": "a.js", "line": 3, "comment": "x"}]',
+            '\n```\nTAIL',
+        ])
+        self.assertEqual(items, [{"file": "a.js", "line": 3, "comment": "x"}])
+        self.assertNotIn('\n```\nTAIL', client.sent)
+
+    def test_prose_preamble_with_brackets(self):
+        items, _ = self.review([
+            'Here [is] it:\n[{"file": "a.js",',
+            ' "line": 1, "comment": "deps []"}]',
+        ])
+        self.assertEqual(items, [{"file": "a.js", "line": 1, "comment": "deps []"}])
+
+    def test_truncated_reply_with_no_complete_item_falls_back(self):
+        items, _ = self.review(['[{"file": "a.js", "li'], done_reason='length')
+        self.assertEqual(items[0]['file'], 'UNKNOWN')
+
+    def test_empty_reply(self):
+        items, _ = self.review(['[]'])
+        self.assertEqual(items, [])
+
+    def test_truncated_reply_keeps_complete_items_and_is_not_cached(self):
+        items, _ = self.review([
+            'Here is the format:\n[]\n```json\n',
+            '[{"file": "a.js", "line": 1, "comment": "x"},\n',
+            ' {"file": "b.js", "line": 2, "comm',
+        ], done_reason='length')
+        self.assertEqual(items, [{"file": "a.js", "line": 1, "comment": "x"}])
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()